@@ -55,31 +55,16 @@ with DAG(
                 }
     )
 
-    load_dim_openings_ = PythonOperator(
-        task_id = 'load_dim_openings',
-        python_callable=load_dim_openings,
-        op_kwargs={
-            'container_name': "/chess-etl-files",
-            'dim_destination': "gold/dim_openings.parquet"
-                }
-    )
-
-    load_dim_date_ = PythonOperator(
-        task_id = 'load_dim_date',
-        python_callable=load_dim_date,
-        op_kwargs={
-            'container_name': "/chess-etl-files",
-            'dim_destination': "gold/dim_date.parquet"
-                }
+    # Check which gold layer files already exist for the loaders below
+    probe_gold_layer_ = PythonOperator(
+        task_id='probe_gold_layer',
+        python_callable=probe_gold_layer
     )
 
-    load_dim_time_control_ = PythonOperator(
-        task_id = 'load_dim_time_control',
-        python_callable=load_dim_time_control,
-        op_kwargs={
-            'container_name': "/chess-etl-files",
-            'dim_destination': "gold/dim_time_control.parquet"
-                    }
+    # Build the openings, date and time control dimensions from a single read of the silver file
+    build_all_dims_ = PythonOperator(
+        task_id = 'build_all_dims',
+        python_callable=build_all_dims
     )
 
     load_dim_results_ = PythonOperator(
@@ -97,7 +82,6 @@ with DAG(
         op_kwargs={
             'container_name': "/chess-etl-files",
             'fact_table_destination': "gold/fact_table.parquet",
-            'exec_date': "{{ execution_date }}"
                 },
         outlets=[my_fact_file]
     )
@@ -105,6 +89,6 @@ with DAG(
     # End Workflow
     end = DummyOperator(task_id='end_workflow')
     
-    start >> extract_data_from_chess_api >> transform_json_to_fact_table_ >> [load_dim_openings_, load_dim_date_, load_dim_time_control_, load_dim_results_]  
-    [load_dim_openings_, load_dim_date_, load_dim_time_control_, load_dim_results_] >> load_fact_table_  >> end
+    start >> extract_data_from_chess_api >> transform_json_to_fact_table_ >> probe_gold_layer_ >> [build_all_dims_, load_dim_results_]  
+    [build_all_dims_, load_dim_results_] >> load_fact_table_  >> end
 
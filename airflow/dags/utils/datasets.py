@@ -1,3 +1,3 @@
 from airflow.datasets import Dataset
 
-my_fact_file = Dataset("az://rbchesssa.blob.core.windows.net/chess-etl-files/gold/fact-games.parquet")
\ No newline at end of file
+my_fact_file = Dataset("az://rbchesssa.blob.core.windows.net/chess-etl-files/gold/fact-games")
\ No newline at end of file
@@ -1,7 +1,10 @@
-import json
 import logging
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
 from tempfile import NamedTemporaryFile
 
+import adbc_driver_postgresql.dbapi as adbc_postgres
 import duckdb
 import pandas as pd
 import requests
@@ -9,6 +12,8 @@ from airflow.models import Variable
 from airflow.providers.microsoft.azure.hooks.wasb import WasbHook
 from airflow.providers.postgres.hooks.postgres import PostgresHook
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from utils import udfs
 
 # Load environment variables from .env file
@@ -25,15 +30,34 @@ container_name = "chess-etl-files"
 az_hook = WasbHook(wasb_conn_id="azure_chess_storage_uri")  
 psql_hook = PostgresHook(postgres_conn_id="azure_chess_dw")
 file_path_template = "az://rbchesssa.blob.core.windows.net/chess-etl-files/{file_name}"
-
-
-def extract_and_load_chess_data(username: str, year: int, month: int) -> list:
+duckdb_extension_directory = "/opt/airflow/duckdb_ext"
+dim_results_sql_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create_dim_results_table.sql")
+
+# Shared HTTP session so repeated API calls reuse pooled connections and retry transient failures
+_session = requests.Session()
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False,
+        ),
+    ),
+)
+
+
+def extract_and_load_chess_data(username: str, year: int, month: int) -> bool:
     """
-    Fetch chess game data for a specific user and month from Chess.com API.
+    Fetch chess game data for a specific user and month from Chess.com API
+    and stream it to the bronze layer in Azure storage.
     :param username: chess.com username
     :param year: Year of the games
     :param month: Month of the games (1-12)
-    :return: List of games in JSON format
+    :return: True once the games have been uploaded
 
     """
 
@@ -46,51 +70,36 @@ def extract_and_load_chess_data(username: str, year: int, month: int) -> list:
 
     url = f"https://api.chess.com/pub/player/{username}/games/{year}/{int(month):02}"
     logging.info(f"Attemping to Fetch Data from: {url}")
-    response = requests.get(url, headers=headers)
-
-    pulled_data = []
 
-    if response.status_code == 200:
-        data = response.json()
-        pulled_data = data.get("games", [])
-        logging.info(
-            f"Successfully Fetched Data From CHess.com API, Records Pulled: {len(pulled_data)}"
-        )
-    else:
-        logging.info(f"Failed to fetch data: {response.status_code}")
-        pulled_data = []
+    blobname = f"bronze/{year}-{int(month):02}-games.json"
+    blob_client = az_hook.get_conn().get_blob_client(container=container_name, blob=blobname)
 
-    # Upload the data to Azure Storage
-    with NamedTemporaryFile("w") as temp:
+    # The response is closed on exit so the connection goes back to the session pool on every branch
+    with _session.get(url, headers=headers, stream=True, timeout=30) as response:
+        # Upload the data to Azure Storage
         logging.info("Attempting to Upload Data to Azure Storage")
-        json.dump(pulled_data, temp)
-        temp.flush()
-        az_hook = WasbHook(wasb_conn_id="azure_chess_storage")
-
-        blobname = f"bronze/{year}-{int(month):02}-games.json"
-        az_hook.load_file(
-            file_path=temp.name,
-            container_name=container_name,
-            blob_name=blobname,
-            overwrite=True,
-        )
+        if response.status_code == 200:
+            # Stream the response body straight into the blob without parsing it. The raw stream has to be
+            # decoded here because Content-Length refers to the compressed payload, so no length is passed.
+            response.raw.decode_content = True
+            blob_client.upload_blob(response.raw, overwrite=True)
+            logging.info("Successfully Streamed Data From Chess.com API")
+        else:
+            logging.info(f"Failed to fetch data: {response.status_code}")
+            blob_client.upload_blob(b'{"games": []}', overwrite=True)
 
-        logging.info(f"Successfully Uploaded Data to Azure Storage as {blobname}")
-        return True
+    logging.info(f"Successfully Uploaded Data to Azure Storage as {blobname}")
+    return True
 
 
 def preview_dataframe(data_frame) -> str:
 
     logging.info("Previewing Dataframe")
     logging.info(data_frame.dtypes)
-    con = duckdb.connect(":memory:")
     # Preview the first n rows of a dataframe
-    table = con.execute(f"SELECT * FROM data_frame LIMIT 5").fetchall()
-    formatted_output = "\n".join(
-        ["\t".join(map(str, row)) for row in table]
-    )  # Convert to string
-    logging.info(formatted_output)
+    logging.info(data_frame.head(5).to_string(index=False))
 
+@lru_cache(maxsize=1)
 def initialize_azure_extension():
     """Initialize a DuckDB connection with Azure extension.
     This function sets up a DuckDB in-memory database connection, installs and loads 
@@ -98,15 +107,26 @@ def initialize_azure_extension():
     applies necessary transport options. Additionally, it initializes user-defined 
     functions (UDFs) for further use.
 
+    The connection is cached, so every call within the same worker process reuses it
+    instead of repeating the extension setup.
+
     Returns:
         duckdb.DuckDBPyConnection: Configured DuckDB connection with Azure extension.
     """
     conn_string = Variable.get("AZURE_STORAGE_CONN_STRING_SECRET")
 
     conn = duckdb.connect(":memory:")
+
+    # Keep the extension binaries in a persistent directory so they are not downloaded on every run
+    conn.sql(f"SET extension_directory = '{duckdb_extension_directory}';")
+    azure_installed = conn.sql(
+        "SELECT installed FROM duckdb_extensions() WHERE extension_name = 'azure';"
+    ).fetchone()
+    if not (azure_installed and azure_installed[0]):
+        conn.sql("INSTALL azure;")
+
     conn.sql(
-        F"""INSTALL azure; 
-        LOAD azure;
+        F"""LOAD azure;
         
         -- Create a secret for the connection string
         CREATE SECRET azure_adls_secret (
@@ -115,6 +135,11 @@ def initialize_azure_extension():
 
         -- Set the azure_transport_option_type to curl to avoid read error
         SET azure_transport_option_type = 'curl';
+
+        -- Read blobs with parallel transfers and larger buffers (4 MiB) to make better use of the bandwidth
+        SET azure_read_transfer_concurrency = 8;
+        SET azure_read_buffer_size = 4194304;
+        SET threads TO {os.cpu_count() or 1};
         """
     )
 
@@ -125,29 +150,40 @@ def initialize_azure_extension():
 
 
 def upload_duckdb_to_azure(
-    duckdb_result: duckdb.DuckDBPyRelation, 
-    container_name: str, 
-    blob_name: str
+    con: duckdb.DuckDBPyConnection,
+    duckdb_result: duckdb.DuckDBPyRelation | pd.DataFrame,
+    container_name: str,
+    blob_name: str,
+    partition_by: list[str] | None = None
 ) -> None:
     """
-    Uploads a DuckDB result to Azure Blob Storage as a Parquet file.
+    Writes a DuckDB result to Azure Blob Storage as a Parquet file.
+    The data is streamed straight from DuckDB into the blob with COPY TO, so the
+    result is never materialized as a pandas DataFrame or written to a local file.
     Args:
-        duckdb_result (duckdb.DuckDBPyRelation): The DuckDB result to upload.
+        con (duckdb.DuckDBPyConnection): Connection returned by `initialize_azure_extension`.
+        duckdb_result (duckdb.DuckDBPyRelation | pd.DataFrame): The result to upload.
         container_name (str): The name of the Azure Blob Storage container.
-        blob_name (str): The name of the blob in Azure Blob Storage.
-    """ 
-    logging.info(f"File To be loaded has {duckdb_result.shape}")
-    with NamedTemporaryFile("w", suffix=".parquet") as temp_file:
-        df = duckdb_result.fetchdf()
-
-        df.to_parquet(temp_file.name, index=False)
-        az_hook.load_file(
-            file_path=temp_file.name,
-            container_name=container_name,
-            blob_name=blob_name,
-            overwrite=True,
-        )
-    logging.info(f"Successfully Loaded to Azure Storage as {blob_name}")
+        blob_name (str): The name of the blob in Azure Blob Storage, or the folder
+            when `partition_by` is set.
+        partition_by (list[str] | None): Columns to hive partition the output by. Only
+            the partitions present in the result are overwritten.
+    """
+    if isinstance(duckdb_result, pd.DataFrame):
+        con.register("upload_rel", duckdb_result)
+    else:
+        duckdb_result.to_view("upload_rel")
+
+    blob_path = f"az://{storage_account_name}.blob.core.windows.net/{container_name}/{blob_name}"
+    copy_options = "FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE 122880"
+    if partition_by:
+        copy_options += f", PARTITION_BY ({', '.join(partition_by)}), OVERWRITE_OR_IGNORE"
+
+    rows_written = con.execute(
+        f"""COPY upload_rel TO '{blob_path}'
+            ({copy_options})"""
+    ).fetchone()[0]
+    logging.info(f"Successfully Loaded {rows_written} rows to Azure Storage as {blob_name}")
 
 
 def transform_json_to_fact_table(year: int, month: int, **kwargs) -> None:
@@ -166,8 +202,28 @@ def transform_json_to_fact_table(year: int, month: int, **kwargs) -> None:
     destination_blob_name = f"silver/fact-{year}-{int(month):02}-games.parquet"
 
     logging.info(f"Attempting to Transform Data from {source_blob_name}")
+    # Parse the PGN headers into a map once per game instead of re-scanning the PGN for every tag.
     fct = con.sql(
-        """SELECT url as game_url,
+        rf"""WITH parsed AS (
+                SELECT *,
+                    MAP_FROM_ENTRIES(
+                        LIST_TRANSFORM(
+                            REGEXP_EXTRACT_ALL(pgn, '\[\w+ "[^"]*"\]'),
+                            tag -> REGEXP_EXTRACT(tag, '\[(\w+) "([^"]*)"\]', ['key', 'value'])
+                        )
+                    ) AS tags,
+                    REGEXP_EXTRACT_ALL(pgn, '\. (.*?) {{\[', 1) AS moves
+                FROM (
+                    -- The bronze file is the raw API response, so expand its games array into rows.
+                    -- The whole month is a single JSON object, which can exceed the default 16 MiB object limit.
+                    SELECT UNNEST(games, max_depth := 2)
+                    FROM read_json(
+                        '{file_path_template.format(file_name=source_blob_name)}',
+                        maximum_object_size = 1073741824
+                    )
+                )
+            )
+            SELECT url as game_url,
             time_control as time_control,
             rated as rated,
             time_class as time_class,
@@ -175,38 +231,29 @@ def transform_json_to_fact_table(year: int, month: int, **kwargs) -> None:
             white.rating as white_rating,
             white.result as white_result,
             black.rating as black_rating,
-            black.result as black_result,    
-            REGEXP_EXTRACT(pgn, '\[Event "(.*?)"', 1) as pgn_event,
-            REGEXP_EXTRACT(pgn, '\[Site "(.*?)"', 1) as pgn_site,
-            STRPTIME(REPLACE(REGEXP_EXTRACT(pgn, '\[Date "(.*?)"', 1), '.', '/'), '%Y/%m/%d')::DATE AS game_date, 
-            REGEXP_EXTRACT(pgn, '\[White "(.*?)"', 1) as pgn_white_user,   
-            REGEXP_EXTRACT(pgn, '\[Black "(.*?)"', 1) as pgn_black_user,
-            REGEXP_EXTRACT(pgn, '\[Result "(.*?)"', 1) as pgn_result,
-            REGEXP_EXTRACT(pgn, '\[CurrentPosition "(.*?)"', 1) as pgn_current_position,
-            REGEXP_EXTRACT(pgn, '\[Timezone "(.*?)"', 1) as pgn_timezone,
-            REGEXP_EXTRACT(pgn, '\[ECO "(.*?)"', 1) as pgn_eco,
-            REGEXP_EXTRACT(pgn, '\[ECOUrl "(.*?)"', 1) as pgn_eco_url,
-            STRPTIME(REGEXP_EXTRACT(pgn, '\[StartTime "(.*?)"', 1), '%H:%M:%S'):: TIME as start_time,
-            STRPTIME(REGEXP_EXTRACT(pgn, '\[EndTime "(.*?)"', 1), '%H:%M:%S'):: TIME as end_time,
-                            STRPTIME(REPLACE(REGEXP_EXTRACT(pgn, '\[EndDate "(.*?)"', 1), '.', '/'), '%Y/%m/%d')::DATE AS end_game_date,
-            ARRAY_TO_STRING(REGEXP_EXTRACT_ALL(pgn, '\. (.*?) {\[', 1), ' ') as pgn_raw,
-            add_move_numbers(REGEXP_EXTRACT_ALL(pgn, '\. (.*?) {\[', 1)) as pgn_trans"""
-        + f" FROM '{file_path_template.format(file_name=source_blob_name)}'"
-    ).fetchdf()
-
-    # Ensure Data accuracy by ensuring that the dates are in the correct format.
-    fct["start_time"] = pd.to_datetime(
-        fct["game_date"].astype(str) + " " + fct["start_time"].astype(str),
-        format="%Y-%m-%d %H:%M:%S",
-    )
-    fct["end_time"] = pd.to_datetime(
-        fct["end_game_date"].astype(str) + " " + fct["end_time"].astype(str),
-        format="%Y-%m-%d %H:%M:%S",
+            black.result as black_result,
+            tags['Event'] as pgn_event,
+            tags['Site'] as pgn_site,
+            STRPTIME(REPLACE(tags['Date'], '.', '/'), '%Y/%m/%d')::DATE AS game_date,
+            tags['White'] as pgn_white_user,
+            tags['Black'] as pgn_black_user,
+            tags['Result'] as pgn_result,
+            tags['CurrentPosition'] as pgn_current_position,
+            tags['Timezone'] as pgn_timezone,
+            tags['ECO'] as pgn_eco,
+            tags['ECOUrl'] as pgn_eco_url,
+            (STRPTIME(REPLACE(tags['Date'], '.', '/'), '%Y/%m/%d')::DATE
+                + STRPTIME(tags['StartTime'], '%H:%M:%S')::TIME) as start_time,
+            (STRPTIME(REPLACE(tags['EndDate'], '.', '/'), '%Y/%m/%d')::DATE
+                + STRPTIME(tags['EndTime'], '%H:%M:%S')::TIME) as end_time,
+            STRPTIME(REPLACE(tags['EndDate'], '.', '/'), '%Y/%m/%d')::DATE AS end_game_date,
+            ARRAY_TO_STRING(moves, ' ') as pgn_raw,
+            add_move_numbers(moves) as pgn_trans
+            FROM parsed"""
     )
 
     # Upload the file to silver layer
-    fct = con.from_df(fct)
-    upload_duckdb_to_azure(fct, container_name=container_name, blob_name=destination_blob_name)
+    upload_duckdb_to_azure(con, fct, container_name=container_name, blob_name=destination_blob_name)
 
     # Push File name to xcom
     ti = kwargs["ti"]
@@ -217,115 +264,130 @@ def transform_json_to_fact_table(year: int, month: int, **kwargs) -> None:
 
 ########################################### Loading Sripts for Gold Layer ##############################
 
+gold_layer_blobs = [
+    "gold/dim_openings.parquet",
+    "gold/dim_date.parquet",
+    "gold/dim_time_control.parquet",
+    "gold/dim_results.parquet",
+]
+# The fact table is a folder of year/month partitions, so it is checked by prefix
+gold_fact_folder = "gold/fact-games"
+# Single file fact table written before the partitioned layout, only read to seed the partitions
+legacy_gold_fact_file = "gold/fact-games.parquet"
+
+
+def probe_gold_layer(**kwargs) -> dict:
+    """Checks which gold layer files already exist in Azure storage.
+    The result is pushed to XComs so the gold loaders can share a single set of
+    lookups instead of each checking for its own blob.
+
+    Returns:
+        dict: Mapping of gold layer blob name to whether it exists.
+    """
+    gold_blobs = {
+        blob_name: az_hook.check_for_blob(container_name=container_name, blob_name=blob_name)
+        for blob_name in [*gold_layer_blobs, legacy_gold_fact_file]
+    }
+    gold_blobs[gold_fact_folder] = az_hook.check_for_prefix(
+        container_name=container_name, prefix=f"{gold_fact_folder}/", delimiter="/"
+    )
+    logging.info(f"Gold layer files: {gold_blobs}")
+    return gold_blobs
+
 
-def load_dim_openings(**kwargs):
+def gold_blob_exists(ti, blob_name: str) -> bool:
+    """Looks up whether a gold layer file exists from the `probe_gold_layer` XCom."""
+    gold_blobs = ti.xcom_pull(task_ids="probe_gold_layer", dag_id="pull_data_from_chess_api")
+    return gold_blobs[blob_name]
+
+
+def load_dim_openings(con: duckdb.DuckDBPyConnection, ti, source_table: str) -> None:
     """
         Loads and updates the dimensional table for chess openings in Gold Layer.
         Extracts only chess opening details and appends them to an existing dimensional 
         table or creates a new one if it doesn't exist.
 
     Args:
-        **kwargs: Arbitrary keyword arguments passed from the Airflow task, 
-                  including the task instance (`ti`) for XComs interaction.
+        con (duckdb.DuckDBPyConnection): Connection returned by `initialize_azure_extension`.
+        ti: Task instance object for accessing Airflow XComs.
+        source_table (str): Table holding the silver layer fact data.
 
     Returns:
         None
     """
-
-    # Extract filename from airflow xcoms from previous run
-    ti = kwargs["ti"]
-    filename = ti.xcom_pull(
-        task_ids="transform_json_to_fact_table",
-        dag_id="pull_data_from_chess_api",
-        key="fact_blob_name",
-    )
-    # filename  = kwargs['dim_destination']
-    logging.info(f"Received File Name: {filename}")
-
-    con = initialize_azure_extension()
-
     dim_file_name = "gold/dim_openings.parquet"
-    source_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{filename}"
     destination_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{dim_file_name}"
 
     # Check existence of file in Azure storage
-    file_exists = az_hook.check_for_blob(
-        container_name=container_name, blob_name=dim_file_name
-    )
+    file_exists = gold_blob_exists(ti, dim_file_name)
 
     if file_exists:
+        # Only add openings that are not in the dimension yet, then append the existing rows
         cur_dim_openings = con.sql(
-            f"""SELECT DISTINCT pgn_eco_url, 
+            f"""WITH new_openings AS (
+                    SELECT DISTINCT src.pgn_eco_url, src.pgn_eco
+                    FROM {source_table} AS src
+                    ANTI JOIN '{destination_file_path}' AS dim USING (pgn_eco_url)
+                    -- NULL keys never match the anti join and would be appended again on every run
+                    WHERE src.pgn_eco_url IS NOT NULL
+                )
+                SELECT pgn_eco_url,
                         extract_opening_name(pgn_eco_url) as opening_name,
-                        get_opening_family(opening_name) as opening_family,
-                        get_opening_variation(opening_name) as opening_variation,
-                        pgn_eco as eco_code 
-                
-                FROM '{source_file_path}'
-                WHERE pgn_eco_url NOT IN (
-                    SELECT pgn_eco_url 
-                    FROM '{destination_file_path}'
-                        )
-                UNION  -- Simply append existing data
+                        LIST_ELEMENT(STRING_SPLIT(opening_name, ':'), 1) as opening_family,
+                        COALESCE(LIST_ELEMENT(STRING_SPLIT(opening_name, ':'), 2), opening_name) as opening_variation,
+                        pgn_eco as eco_code
+                FROM new_openings
+
+                UNION ALL
 
-                SELECT * FROM '{destination_file_path}';                                 
-                                """
-        ).fetchdf()
+                SELECT * FROM '{destination_file_path}';
+                """
+        )
     else:
+        # Look up each distinct opening once before splitting its name
         cur_dim_openings = con.sql(
-            f"""SELECT DISTINCT pgn_eco_url, 
+            f"""WITH new_openings AS (
+                    SELECT DISTINCT pgn_eco_url, pgn_eco
+                    FROM {source_table}
+                    WHERE pgn_eco_url IS NOT NULL
+                )
+                SELECT pgn_eco_url,
                         extract_opening_name(pgn_eco_url) as opening_name,
-                        get_opening_family(opening_name) as opening_family,
-                        get_opening_variation(opening_name) as opening_variation,
+                        LIST_ELEMENT(STRING_SPLIT(opening_name, ':'), 1) as opening_family,
+                        COALESCE(LIST_ELEMENT(STRING_SPLIT(opening_name, ':'), 2), opening_name) as opening_variation,
                         pgn_eco as eco_code
-                    FROM '{source_file_path}'; """
-        ).fetchdf()
-
-    # Create NamedTemp File and upload to azure
-    with NamedTemporaryFile("w", suffix=".parquet") as temp_file:
-        cur_dim_openings.to_parquet(temp_file.name, index=False)
-        az_hook.load_file(
-            file_path=temp_file.name,
-            container_name=container_name,
-            blob_name=dim_file_name,
-            overwrite=True,
+                FROM new_openings; """
         )
-    logging.info(f"Successfully Loaded Dim Openings to Azure Storage as {dim_file_name}")
 
-    # Install azure extension
+    # Upload the file to gold layer
+    upload_duckdb_to_azure(con, cur_dim_openings, container_name, dim_file_name)
 
 
-def load_dim_date(**kwargs):
+def load_dim_date(con: duckdb.DuckDBPyConnection, ti, source_table: str) -> None:
     """Loads and transforms the dim_date dimension table from fact table in silver layer.
     Extracts all the dates and appends them to an existing dimensional date table 
     or creates a new one if it doesn't exist.
     Args:
-        **kwargs: Keyword arguments passed from the Airflow task, 
-        including task instance (ti).
+        con (duckdb.DuckDBPyConnection): Connection returned by `initialize_azure_extension`.
+        ti: Task instance object for accessing Airflow XComs.
+        source_table (str): Table holding the silver layer fact data.
     """    
-    
-    # Extract filename from airflow xcoms from previous run
-    ti = kwargs["ti"]
-    filename = ti.xcom_pull(
-        task_ids="transform_json_to_fact_table",
-        dag_id="pull_data_from_chess_api",
-        key="fact_blob_name",
-    )
-    # filename  = kwargs['dim_destination']
-    logging.info(f"Received File Name: {filename}")
-    con = initialize_azure_extension()
     dim_file_name = "gold/dim_date.parquet"
-
-    source_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{filename}"
     destination_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{dim_file_name}"
     # Check existence of file in Azure storage
-    file_exists = az_hook.check_for_blob(container_name=container_name, 
-                                         blob_name=dim_file_name)
+    file_exists = gold_blob_exists(ti, dim_file_name)
 
     if file_exists:
         dim_date = con.sql(
             f"""
-                SELECT DISTINCT game_date,
+                WITH new_dates AS (
+                    SELECT DISTINCT src.game_date
+                    FROM {source_table} AS src
+                    ANTI JOIN '{destination_file_path}' AS dim USING (game_date)
+                    -- NULL keys never match the anti join and would be appended again on every run
+                    WHERE src.game_date IS NOT NULL
+                )
+                SELECT game_date,
                         EXTRACT(YEAR FROM game_date) AS year,
                         EXTRACT(MONTH FROM game_date) AS month, 
                         strftime('%B', game_date) AS month_name,
@@ -336,12 +398,9 @@ def load_dim_date(**kwargs):
                             WHEN CAST(strftime('%m', game_date) AS INTEGER) BETWEEN 4 AND 6 THEN 2
                             WHEN CAST(strftime('%m', game_date) AS INTEGER) BETWEEN 7 AND 9 THEN 3
                             ELSE 4 END AS quarter
-                            
-                FROM '{source_file_path}' 
-                WHERE game_date NOT IN 
-                
-                ( SELECT game_date FROM '{destination_file_path}')
-                UNION
+                FROM new_dates
+
+                UNION ALL
                 SELECT * FROM '{destination_file_path}';
                 
                 """
@@ -360,72 +419,70 @@ def load_dim_date(**kwargs):
                             WHEN CAST(strftime('%m', game_date) AS INTEGER) BETWEEN 4 AND 6 THEN 2
                             WHEN CAST(strftime('%m', game_date) AS INTEGER) BETWEEN 7 AND 9 THEN 3
                             ELSE 4 END AS quarter
-                FROM '{source_file_path}'
+                FROM {source_table}
+                WHERE game_date IS NOT NULL
                 ORDER BY game_date; 
     """
         )
 
     # Upload the file to gold layer
-    upload_duckdb_to_azure(dim_date, container_name, dim_file_name)
+    upload_duckdb_to_azure(con, dim_date, container_name, dim_file_name)
 
 
-def load_dim_time_control(**kwargs):
+def load_dim_time_control(con: duckdb.DuckDBPyConnection, ti, source_table: str) -> None:
     """Loads and transforms the dim_time_control dimension table from the fact table 
     in the silver layer, and uploads the result to the gold layer in Azure storage.
 
     Args:
-        **kwargs: Arbitrary keyword arguments, including:
-            - ti: Task instance object for accessing Airflow XComs.
+        con (duckdb.DuckDBPyConnection): Connection returned by `initialize_azure_extension`.
+        ti: Task instance object for accessing Airflow XComs.
+        source_table (str): Table holding the silver layer fact data.
 
     Returns:
         None
     """
-    
-    # Extract filename from airflow xcoms from previous run
-    ti = kwargs["ti"]
-    filename = ti.xcom_pull(
-        task_ids="transform_json_to_fact_table",
-        dag_id="pull_data_from_chess_api",
-        key="fact_blob_name",
-    )
-    logging.info(f"Received File Name: {filename}")
-    con = initialize_azure_extension()
-
     dim_file_name = "gold/dim_time_control.parquet"
-    source_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{filename}"
     destination_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{dim_file_name}"
     # Check existence of file in Azure storage
-    file_exists = az_hook.check_for_blob(
-        container_name=container_name, blob_name=dim_file_name
-    )
+    file_exists = gold_blob_exists(ti, dim_file_name)
 
     if file_exists:
         dim_time_control = con.sql(
             f"""
-                SELECT DISTINCT format_time_control(time_control) as time_control, time_class 
-                FROM '{source_file_path}' WHERE time_control NOT IN 
-                ( SELECT time_control FROM '{destination_file_path}')
-                UNION 
+                WITH new_time_controls AS (
+                    SELECT DISTINCT format_time_control(time_control) as time_control, time_class
+                    FROM {source_table}
+                    -- NULL keys never match the anti join and would be appended again on every run
+                    WHERE time_control IS NOT NULL
+                )
+                SELECT src.* FROM new_time_controls AS src
+                ANTI JOIN '{destination_file_path}' AS dim USING (time_control)
+                UNION ALL
                 SELECT * FROM '{destination_file_path}';
                 """
         )
 
     else:
         dim_time_control = con.sql(
-            f"""SELECT format_time_control(time_control) as time_control, time_class
-                FROM '{source_file_path}';
+            f"""SELECT DISTINCT format_time_control(time_control) as time_control, time_class
+                FROM {source_table}
+                WHERE time_control IS NOT NULL;
     """
         )
 
     # Upload the file to gold layer
-    upload_duckdb_to_azure(dim_time_control, container_name, dim_file_name)
+    upload_duckdb_to_azure(con, dim_time_control, container_name, dim_file_name)
 
 
-def load_dim_results(**kwargs):
-    """Updates or creates the 'dim_results' dimension table in the datalake Gold layer.
+def build_all_dims(**kwargs):
+    """Builds the openings, date and time control dimension tables in the Gold layer.
+    The silver layer fact file is read from Azure once into a temporary table, and
+    every dimension is derived from that table on the same DuckDB connection.
+
     Args:
         **kwargs: Arbitrary keyword arguments, including:
             - ti: Task instance object for accessing Airflow XComs.
+
     Returns:
         None
     """
@@ -436,56 +493,48 @@ def load_dim_results(**kwargs):
         dag_id="pull_data_from_chess_api",
         key="fact_blob_name",
     )
-
-    # filename  = kwargs['dim_destination']
     logging.info(f"Received File Name: {filename}")
+
     con = initialize_azure_extension()
+    source_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{filename}"
+
+    # Only the columns used by the dimensions are read from the silver file
+    con.execute(
+        f"""CREATE OR REPLACE TEMP TABLE silver_fact AS
+            SELECT pgn_eco_url, pgn_eco, game_date, time_control, time_class
+            FROM '{source_file_path}';"""
+    )
+
+    load_dim_openings(con, ti, "silver_fact")
+    load_dim_date(con, ti, "silver_fact")
+    load_dim_time_control(con, ti, "silver_fact")
+
+
+def load_dim_results(**kwargs):
+    """Creates the static 'dim_results' dimension table in the datalake Gold layer.
+    The result codes are fixed reference data kept in `sql/create_dim_results_table.sql`,
+    so the table is only built and uploaded once, when it does not exist yet.
+    Args:
+        **kwargs: Arbitrary keyword arguments, including:
+            - ti: Task instance object for accessing Airflow XComs.
+    Returns:
+        None
+    """
+    ti = kwargs["ti"]
     dim_file_name = "gold/dim_results.parquet"
 
-    destination_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{dim_file_name}"
     # Check existence of file in Azure storage
-    file_exists = az_hook.check_for_blob(
-        container_name=container_name, blob_name=dim_file_name
-    )
+    file_exists = gold_blob_exists(ti, dim_file_name)
     if file_exists:
-        dim_results = con.sql(f"SELECT * FROM '{destination_file_path}'")
+        logging.info(f"{dim_file_name} already exists, skipping")
+        return
 
-    else:
-        dim_results = con.sql(
-            """
-                SELECT 'win' AS result_code, 'Win' AS result, 'Win' AS description
-        UNION ALL
-        SELECT 'checkmated', 'Loss', 'Checkmated'
-        UNION ALL
-        SELECT 'agreed', 'Draw', 'Draw agreed'
-        UNION ALL
-        SELECT 'repetition', 'Draw', 'Draw by repetition'
-        UNION ALL
-        SELECT 'timeout', 'Win', 'Timeout'
-        UNION ALL
-        SELECT 'resigned', 'Loss', 'Resigned'
-        UNION ALL
-        SELECT 'stalemate', 'Draw', 'Stalemate'
-        UNION ALL
-        SELECT 'lose', 'Loss', 'Lose'
-        UNION ALL
-        SELECT 'insufficient', 'Draw', 'Insufficient material'
-        UNION ALL
-        SELECT '50move', 'Draw', 'Draw by 50-move rule'
-        UNION ALL
-        SELECT 'abandoned', 'Draw', 'Abandoned'
-        UNION ALL
-        SELECT 'kingofthehill', 'Win', 'Opponent king reached the hill'
-        UNION ALL
-        SELECT 'threecheck', 'Win', 'Checked for the 3rd time'
-        UNION ALL
-        SELECT 'timevsinsufficient', 'Draw', 'Draw by timeout vs insufficient material'
-        UNION ALL
-        SELECT 'bughousepartnerlose', 'Loss', 'Bughouse partner lost'
-        """
-        )
+    with open(dim_results_sql_path) as sql_file:
+        dim_results_sql = sql_file.read()
 
-        upload_duckdb_to_azure(dim_results, container_name, dim_file_name)
+    con = initialize_azure_extension()
+    dim_results = con.sql(dim_results_sql)
+    upload_duckdb_to_azure(con, dim_results, container_name, dim_file_name)
 
 
 def load_fact_table(**kwargs):
@@ -493,11 +542,10 @@ def load_fact_table(**kwargs):
     This function fetches transformed data from the silver layer, processes it to 
     generate a fact table, and uploads the updated fact table to Azure Blob Storage. 
     It ensures deduplication by retaining the most recent records based on the 
-    `last_updated` timestamp.
+    `last_updated` timestamp, which is the time the rows were loaded.
     Args:
         **kwargs: Arbitrary keyword arguments, including:
             - ti: Task instance for XCom communication.
-            - exec_date: Execution date of the DAG run.
     Returns:
         None
         """
@@ -509,28 +557,24 @@ def load_fact_table(**kwargs):
         dag_id="pull_data_from_chess_api",
         key="fact_blob_name",
     )
-    exec_date = kwargs["exec_date"]
-    logging.info(exec_date)
-    # exec_date = datetime.strptime(kwargs['exec_date'], "%Y-%m-%d").date()
+    # Rows are stamped with the load time instead of the DAG's logical date, so a rerun or backfill
+    # of an older month is still newer than everything the warehouse has already picked up.
+    load_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    logging.info(f"Stamping rows with load time: {load_time}")
 
     logging.info(f"Received File Name: {filename}")
     # Initailize azure and duckdb instance
     con = initialize_azure_extension()
 
     # Define Source and destinations
-    fact_file_name = "gold/fact-games.parquet"
     source_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{filename}"
-    destination_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{fact_file_name}"
+    destination_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{gold_fact_folder}/**/*.parquet"
+    legacy_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{legacy_gold_fact_file}"
     # Check existence of file in Azure storage
-    file_exists = az_hook.check_for_blob(container_name=container_name, blob_name=fact_file_name)
+    file_exists = gold_blob_exists(ti, gold_fact_folder)
+    legacy_file_exists = gold_blob_exists(ti, legacy_gold_fact_file)
 
-    # Create references for all dimensional files
-    dim_openings = "az://rbchesssa.blob.core.windows.net/chess-etl-files/gold/dim_openings.parquet"
-    dim_date = "az://rbchesssa.blob.core.windows.net/chess-etl-files/gold/dim_date.parquet"
-    dim_results = "az://rbchesssa.blob.core.windows.net/chess-etl-files/gold/dim_results.parquet"
-    dim_time_control = "az://rbchesssa.blob.core.windows.net/chess-etl-files/gold/dim_time_control.parquet"
-
-    fct = con.sql(
+    fact_table = con.sql(
         f"""
             SELECT game_url as game_url,
                 game_date as game_date,
@@ -560,55 +604,146 @@ def load_fact_table(**kwargs):
                 pgn_eco_url as opening_url,
                 pgn_trans as game_pgn,
                 get_pgn_depth(pgn_trans) as moves,
-                '{exec_date}'::TIMESTAMP as last_updated
+                '{load_time}'::TIMESTAMP as last_updated
             FROM '{source_file_path}' as fact""")
-
-    fact_table = con.sql(
-        f"""SELECT fact.* FROM fct AS fact
-                LEFT JOIN '{dim_date}' AS dim_date ON fact.game_date = dim_date.game_date
-                LEFT JOIN '{dim_openings}' AS dim_openings ON fact.opening_url = dim_openings.pgn_eco_url
-                LEFT JOIN '{dim_results}' AS dim_results_my ON fact.my_result = dim_results_my.result_code
-                LEFT JOIN '{dim_results}' AS dim_results_op ON fact.opponent_result = dim_results_op.result_code
-                LEFT JOIN '{dim_time_control}' AS dim_time_control ON fact.time_control = dim_time_control.time_control;
-            """)
     logging.info(f"fact table to be added has: {fact_table.shape}")
 
+    # Only the year/month partitions that receive new games are read back and rewritten
+    new_partitions = con.sql(
+        "SELECT DISTINCT year(game_date) AS year, month(game_date) AS month FROM fact_table"
+    ).fetchall()
+    seed_from_legacy_file = legacy_file_exists and not file_exists
+    if not new_partitions and not seed_from_legacy_file:
+        logging.info("No new games to add to the fact table")
+        return
+
     if file_exists:
-        prev_fact_table = con.sql(f"""SELECT * FROM '{destination_file_path}' """)
-        logging.info(f"The Previous fact table has : {prev_fact_table.shape}")  # Should not be (0, 0)
+        # Games without a date land in the year=NULL partition, which only matches IS NULL
+        partition_filter = " OR ".join(
+            "(year IS NULL AND month IS NULL)" if year is None else f"(year = {year} AND month = {month})"
+            for year, month in new_partitions
+        )
+        prev_fact_table = con.sql(
+            f"""SELECT * EXCLUDE (year, month)
+                FROM read_parquet('{destination_file_path}', hive_partitioning = true)
+                WHERE {partition_filter}"""
+        )
 
-        both_tables = con.sql(f"""SELECT * FROM prev_fact_table
-                                    UNION ALL 
-                                    SELECT * FROM fact_table;""")
-        logging.info(f"Both Tables have: {both_tables.shape}")
+    elif seed_from_legacy_file:
+        # One-time bootstrap: seed every partition from the old single file fact table,
+        # cast to the current column types so the partitions keep the same schema.
+        logging.info(f"Seeding {gold_fact_folder} partitions from {legacy_gold_fact_file}")
+        legacy_columns = ", ".join(
+            f'"{name}"::{col_type} AS "{name}"' for name, col_type in zip(fact_table.columns, fact_table.types)
+        )
+        prev_fact_table = con.sql(f"SELECT {legacy_columns} FROM '{legacy_file_path}'")
+
+    if file_exists or seed_from_legacy_file:
+        # Keep only the most recent version of each game in a single pass.
         new_fact_table = con.sql(
-            f"""SELECT * 
+            """SELECT *
                 FROM (
-                    SELECT *, 
-                            ROW_NUMBER() OVER ( PARTITION BY game_url ORDER BY last_updated DESC) AS rn
-                            FROM both_tables
-                    )
-                WHERE rn = 1;
+                    SELECT * FROM prev_fact_table
+                    UNION ALL BY NAME
+                    SELECT * FROM fact_table
+                )
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY game_url ORDER BY last_updated DESC) = 1;
                 """
-        ).fetchdf()
-
-        # Here i'm droping the row number column and converting the query back to a Duckdb.Pyrelation Object so that i can
-        # pass it into the upload duckdb to azure function.
-        new_fact_table.drop(columns=["rn"], inplace=True)
-        new_fact_table = con.from_df(new_fact_table)
+        )
 
     else:
         new_fact_table = fact_table
 
-    upload_duckdb_to_azure(new_fact_table, container_name, fact_file_name)
+    partitioned_fact_table = con.sql(
+        "SELECT *, year(game_date) AS year, month(game_date) AS month FROM new_fact_table"
+    )
+    upload_duckdb_to_azure(
+        con, partitioned_fact_table, container_name, gold_fact_folder, partition_by=["year", "month"]
+    )
 
 
 #################################### LOAD TO DATABASES ##############################################
 
 
+# DuckDB types that are spelled differently in Postgres, everything else is used as is.
+duckdb_to_postgres_types = {
+    "DOUBLE": "DOUBLE PRECISION",
+    "FLOAT": "REAL",
+    "UBIGINT": "NUMERIC",
+    "HUGEINT": "NUMERIC",
+}
+
+
+def copy_relation_to_postgres(
+    duckdb_result: duckdb.DuckDBPyRelation,
+    table_name: str,
+    schema: str = "chess_dw",
+    upsert_key: str | None = None
+) -> None:
+    """
+    Loads the contents of a DuckDB result into a Postgres table using COPY FROM STDIN.
+    The rows are written to a local CSV by DuckDB and streamed to Postgres in a single COPY.
+    Without `upsert_key` the table is replaced and recreated from the result's column types.
+    With `upsert_key` the rows are copied into a staging table and merged into the
+    existing table, updating the rows that already exist.
+    Args:
+        duckdb_result (duckdb.DuckDBPyRelation): The DuckDB result to load.
+        table_name (str): The name of the table in the data warehouse.
+        schema (str): The schema of the table in the data warehouse.
+        upsert_key (str | None): Unique column used to merge into the existing table.
+    """
+    column_names = [f'"{name}"' for name in duckdb_result.columns]
+    columns = ", ".join(
+        f"{name} {duckdb_to_postgres_types.get(str(col_type), str(col_type))}"
+        for name, col_type in zip(column_names, duckdb_result.types)
+    )
+    target_table = f"{schema}.{table_name}"
+    staging_table = f"{table_name}_staging"
+
+    # The file is closed before DuckDB writes to it and is removed once the load is done, so it is never
+    # held open by two writers and the CSV is always read back from a fully written file.
+    temp_file = NamedTemporaryFile(suffix=".csv", delete=False)
+    temp_file.close()
+    try:
+        duckdb_result.write_csv(temp_file.name, header=False)
+
+        raw = psql_hook.get_conn()
+        try:
+            with raw.cursor() as cur, open(temp_file.name, "rb") as csv_file:
+                if upsert_key is None:
+                    cur.execute(f"DROP TABLE IF EXISTS {target_table};")
+                    cur.execute(f"CREATE TABLE {target_table} ({columns});")
+                    cur.copy_expert(f"COPY {target_table} FROM STDIN WITH (FORMAT CSV)", csv_file)
+                    logging.info(f"Copied {cur.rowcount} rows into {target_table}")
+                else:
+                    cur.execute(f"CREATE TEMP TABLE {staging_table} ({columns}) ON COMMIT DROP;")
+                    cur.copy_expert(f"COPY {staging_table} FROM STDIN WITH (FORMAT CSV)", csv_file)
+
+                    # ON CONFLICT needs a unique index, which is missing when the table was recreated by a full load
+                    cur.execute(
+                        f'CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_{upsert_key}_key ON {target_table} ("{upsert_key}");'
+                    )
+                    updates = ", ".join(
+                        f"{name} = EXCLUDED.{name}" for name in column_names if name != f'"{upsert_key}"'
+                    )
+                    cur.execute(
+                        f"""INSERT INTO {target_table} ({", ".join(column_names)})
+                            SELECT {", ".join(column_names)} FROM {staging_table}
+                            ON CONFLICT ("{upsert_key}") DO UPDATE SET {updates};"""
+                    )
+                    logging.info(f"Upserted {cur.rowcount} rows into {target_table}")
+            raw.commit()
+        finally:
+            raw.close()
+    finally:
+        os.unlink(temp_file.name)
+
+
 def load_fact_to_postgres(**kwargs):
     """Loads fact data from datalake gold layer
       into the datawarehouse.
+    Only the games updated after the latest `last_updated` already in the warehouse are
+    read from the gold layer and merged in; the table is fully loaded when it is empty.
 
     Args:
         **kwargs: Arbitrary keyword arguments, including:
@@ -618,31 +753,37 @@ def load_fact_to_postgres(**kwargs):
         None
     """
     ti = kwargs["ti"]
-    last_updated_date = ti.xcom_pull(
+    last_updated = ti.xcom_pull(
         task_ids="get_last_updated_date",
         dag_id="load_data_warehouse",
         key="return_value",
-    )[0][0]
+    )
+    last_updated_date = last_updated[0][0] if last_updated else None
     logging.info(f"Fetching data for Last Updated Date: {last_updated_date}")
     con = initialize_azure_extension()
 
-    fact = con.sql(
-        f"""
-            SELECT * 
-            FROM 'az://rbchesssa.blob.core.windows.net/chess-etl-files/gold/fact-games.parquet'
-        """
-    ).df()
+    fact_file_path = f"az://rbchesssa.blob.core.windows.net/chess-etl-files/{gold_fact_folder}/**/*.parquet"
+    if last_updated_date is None:
+        fact = con.sql(
+            f"""
+                SELECT * 
+                FROM read_parquet('{fact_file_path}', hive_partitioning = false)
+            """
+        )
+        copy_relation_to_postgres(fact, table_name="fact_games")
 
-    logging.info(f"✅ DataFrame Loaded: {fact.shape[0]} rows, {fact.shape[1]} columns")
-    engine = psql_hook.get_sqlalchemy_engine()
+    else:
+        # The filter is pushed down to the Parquet scan, so row groups older than the last load are skipped.
+        # Rows stamped with exactly the last load time are reloaded, the upsert makes that harmless
+        fact = con.sql(
+            f"""
+                SELECT * 
+                FROM read_parquet('{fact_file_path}', hive_partitioning = false)
+                WHERE last_updated >= TIMESTAMP '{last_updated_date}'
+            """
+        )
+        copy_relation_to_postgres(fact, table_name="fact_games", upsert_key="game_url")
 
-    fact.to_sql(
-        name="fact_games",
-        schema="chess_dw",
-        con=engine,
-        if_exists="replace",
-        index=False,
-    )
     logging.info("Successfully Loaded Data to Postgres")
 
 
@@ -665,12 +806,11 @@ def load_dim_table_to_postgres(dim_file_name: str, table_name: str):
             SELECT * 
             FROM '{file_path}'
             """
-    ).df()
+    ).arrow()
 
-    logging.info(f"✅ {dim_file_name} Loaded: {dim.shape[0]} rows, {dim.shape[1]} columns")
-    engine = psql_hook.get_sqlalchemy_engine()
+    # Stream the Arrow batches into Postgres, the ADBC driver bulk loads them with binary COPY
+    with adbc_postgres.connect(psql_hook.get_uri()) as pg_conn, pg_conn.cursor() as cur:
+        rows_loaded = cur.adbc_ingest(table_name, dim, mode="replace", db_schema_name="chess_dw")
+        pg_conn.commit()
 
-    dim.to_sql(
-        name=table_name, schema="chess_dw", con=engine, if_exists="replace", index=False
-    )
-    logging.info(f"Successfully Loaded {dim_file_name} Data to Postgres table {table_name}")
+    logging.info(f"Successfully Loaded {rows_loaded} rows of {dim_file_name} Data to Postgres table {table_name}")
@@ -1,7 +1,9 @@
-import re
 import duckdb
-
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import requests
+from duckdb.typing import BIGINT, VARCHAR
 from selectolax.parser import HTMLParser
 
 
@@ -50,139 +52,125 @@ def extract_opening_data(url):
 
 
 
-def add_move_numbers(pgn: list) -> str:
+def add_move_numbers(pgn: pa.Array) -> pa.Array:
     """
-    Adds move numbers to a list of chess moves in PGN format.
+    Adds move numbers to lists of chess moves in PGN format.
     Args:
-        pgn (list): List of chess moves.
+        pgn (pa.Array): Lists of chess moves, one list per game.
     Returns:
-        str: PGN string with move numbers added.
+        pa.Array: PGN strings with move numbers added.
     Example:
         Input: ["e4", "e5", "Nf3", "Nc6", "Bb5"]
-        Output: "1. e4 e5 2. Nf3 Nc6 3. Bb5"
+        Output: "1. e4 e5 2. Nf3 Nc6 3. Bb5 "
     """
-    moves = pgn
-    
-    # Reconstruct the PGN with move numbers
-    formatted_pgn = []
-    move_number = 1
-    for i in range(0, len(pgn), 2):
-        # Add the move number and the two moves (white and black)
-        formatted_pgn.append(f"{move_number}. {moves[i]} {moves[i+1] if i+1 < len(moves) else ''}")
-        move_number += 1
-    
-    # Join the formatted moves into a single string
-    return ' '.join(formatted_pgn)
-
-
-def get_opening_family(opening_name: str) -> str:
+    if isinstance(pgn, pa.ChunkedArray):
+        pgn = pgn.combine_chunks()
+
+    lengths = pc.fill_null(pc.list_value_length(pgn), 0)
+    moves = pc.list_flatten(pgn)
+
+    # Position of every move within its own game, white moves are the even positions
+    starts = pc.subtract(pc.cumulative_sum(lengths), lengths)
+    position = pc.subtract(
+        pa.array(np.arange(len(moves), dtype=np.int64)),
+        pc.take(starts, pc.list_parent_indices(pgn)),
+    )
+    move_number = pc.cast(pc.add(pc.divide(position, 2), 1), pa.string())
+    numbered_moves = pc.if_else(
+        pc.equal(pc.bit_wise_and(position, 1), 0),
+        pc.binary_join_element_wise(move_number, moves, ". "),
+        moves,
+    )
+
+    # Rebuild one list per game and join the moves into a single string
+    offsets = pa.concat_arrays([pa.array([0], pa.int32()), pc.cast(pc.cumulative_sum(lengths), pa.int32())])
+    games = pa.ListArray.from_arrays(offsets, numbered_moves, mask=pgn.is_null())
+    formatted_pgn = pc.binary_join(games, " ")
+
+    # Games ending on a white move keep the trailing space of the unpaired move
+    return pc.if_else(
+        pc.equal(pc.bit_wise_and(lengths, 1), 1),
+        pc.binary_join_element_wise(formatted_pgn, "", " "),
+        formatted_pgn,
+    )
+
+
+def get_pgn_depth(pgn: pa.Array) -> pa.Array:
     """
-    Extracts the family name of a chess opening from its full name.
-
-    If the opening name contains a colon (":"), the function splits the name
-    at the colon and returns the part before it, which represents the family
-    name of the opening. If no colon is present, the function returns the
-    original opening name.
+    Counts the number of moves in PGN strings.
 
     Args:
-        opening_name (str): The full name of the chess opening.
+        pgn (pa.Array): PGN data of chess games.
 
     Returns:
-        str: The family name of the chess opening.
+        pa.Array: Total number of moves per game.
     """
-    """"""
-    # Get the parent name of the move numbers
+    # Count all move numbers (e.g., '1.', '2.', etc.)
+    return pc.cast(pc.count_substring_regex(pgn, r"\d+\."), pa.int64())
 
-    if ":" in opening_name:
-        name_splitted = opening_name.split(":")
-        return name_splitted[0]
 
-    else:
-        return opening_name
-    
-def get_opening_variation(opening_name: str) -> str:
+def extract_opening_name(url: pa.Array) -> pa.Array:
     """
-    Extracts and returns the variation part of a chess opening name if it contains a colon.
-    Otherwise, returns the full opening name.
+    Extracts the names of the chess openings from the given URLs.
+    This function utilizes the `extract_opening_data` helper function to retrieve
+    opening-related data from each URL and returns the name of the opening.
+    Every distinct URL is only requested once per batch.
     Args:
-        opening_name (str): The name of the chess opening.
+        url (pa.Array): The URLs containing chess opening data.
     Returns:
-        str: The variation part of the opening name or the full name if no variation exists.
+        pa.Array: The names of the chess openings extracted from the URLs.
     """
 
-    # Get the parent name of the move numbers
+    # extract Opening Data
+    opening_names = {}
+    for opening_url in url.to_pylist():
+        if opening_url is not None and opening_url not in opening_names:
+            opening_data = extract_opening_data(opening_url) or {}
+            opening_names[opening_url] = opening_data.get("opening_name")
 
-    if ":" in opening_name:
-        name_splitted = opening_name.split(":")
-        return name_splitted[1]
+    return pa.array([opening_names.get(opening_url) for opening_url in url.to_pylist()], pa.string())
 
-    else:
-        return opening_name
-    
 
-def get_pgn_depth(pgn: str) -> int:
+def format_time_control(timecontrol: pa.Array) -> pa.Array:
     """
-    Counts the number of moves in a PGN string.
+    Converts time control strings into a different format 
+    i.e minute|second(2|1) instead of seconds|seconds(120+1) 
 
     Args:
-        pgn (str): PGN data of a chess game.
+        timecontrol (pa.Array): The time control strings in seconds, optionally with an increment.
 
     Returns:
-        int: Total number of moves.
-    """
-    """"""
-    # this function is supposed to define the number of moves from a pgn file. 
-    moves = re.findall(r'\d+\.', pgn)  # Find all move numbers (e.g., '1.', '2.', etc.)
-    return int(len(moves)) # Return the number of moves
-
-def extract_opening_name(url: str) -> str:
-    """
-    Extracts the name of the chess opening from the given URL.
-    This function utilizes the `extract_opening_data` helper function to retrieve
-    opening-related data from the URL and returns the name of the opening.
-    Args:
-        url (str): The URL containing chess game data.
-    Returns:
-        str: The name of the chess opening extracted from the URL.
+        pa.Array: The formatted time control strings in minutes.
     """
+    tc = pc.extract_regex(timecontrol, r"^(?P<seconds>\d+)\+?(?P<increment>\d*)$")
+    seconds = pc.cast(pc.struct_field(tc, 0), pa.int64())
+    increment = pc.struct_field(tc, 1)
+    minute = pc.cast(pc.divide(seconds, 60), pa.string())
 
-    # extract Opening Data
-    opening_data = extract_opening_data(url)
-    return opening_data['opening_name']
+    formatted = pc.if_else(
+        pc.equal(increment, ""),
+        minute,
+        pc.binary_join_element_wise(minute, increment, "|"),
+    )
+    # Time controls that are not in seconds (e.g. daily games "1/86400") are kept as they are
+    return pc.coalesce(formatted, timecontrol)
 
-def format_time_control(timecontrol: str)-> str:
-    """
-    Converts a time control string into a different format 
-    i.e minute|second(2|1) instead of seconds|seconds(120+1) 
 
-    Args:
-        timecontrol (str): The time control string in seconds, optionally with an increment.
-
-    Returns:
-        str: The formatted time control string in minutes.
-    """
-    
-    if "+" in timecontrol:
-        tc = timecontrol.split("+")
-        minute = int(int(tc[0]) / 60)
-        return "".join([str(minute), "|", tc[1]])
-
-    else: 
-        return str(int(int(timecontrol) / 60))
-    
 def initialize_udfs(connector: duckdb.DuckDBPyConnection)->duckdb.DuckDBPyConnection:
     """
     Registers custom user-defined functions (UDFs) with the provided DuckDB connection.
+    The UDFs are registered as Arrow functions, so each call receives a whole vector of rows.
     Args:
         connector (duckdb.DuckDBPyConnection): The DuckDB connection to register the UDFs with.
     Returns:
         duckdb.DuckDBPyConnection: The DuckDB connection with the UDFs registered.
     """
-    connector.create_function('add_move_numbers', add_move_numbers)
-    connector.create_function('extract_opening_name', extract_opening_name)
-    connector.create_function('get_opening_family', get_opening_family)
-    connector.create_function('get_opening_variation', get_opening_variation)
-    connector.create_function('get_pgn_depth', get_pgn_depth)
-    connector.create_function('format_time_control', format_time_control)
-
-    return connector
\ No newline at end of file
+    connector.create_function('add_move_numbers', add_move_numbers, [duckdb.list_type(VARCHAR)], VARCHAR, type='arrow')
+    # The opening page may not have a name, so this UDF is allowed to return NULL
+    connector.create_function(
+        'extract_opening_name', extract_opening_name, [VARCHAR], VARCHAR, type='arrow', null_handling='special'
+    )
+    connector.create_function('get_pgn_depth', get_pgn_depth, [VARCHAR], BIGINT, type='arrow')
+    connector.create_function('format_time_control', format_time_control, [VARCHAR], VARCHAR, type='arrow')
+
+    return connector